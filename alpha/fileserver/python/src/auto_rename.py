@@ -1,21 +1,52 @@
 import os
 import re
 
+# Anything that is not a word character, hyphen or dot; this also covers \/*?:"<>|
+_SANITIZE_RE = re.compile(r'[^\w\-.]+')
+
+# Spaces become underscores and the invalid filename characters are dropped in one C pass
+_SANITIZE_TR = str.maketrans({' ': '_', '\\': None, '/': None, '*': None, '?': None, ':': None, '"': None, '<': None, '>': None, '|': None})
+
 def sanitize_filename(name):
     """
     Sanitize a filename by removing invalid characters and replacing spaces with underscores
     """
-    # Remove any invalid filename characters
-    sanitized = re.sub(r'[\\/*?:"<>|]', '', name)
-    # Replace spaces with underscores
-    sanitized = sanitized.replace(' ', '_')
-    # Remove any other potentially problematic characters
-    sanitized = re.sub(r'[^\w\-\.]', '', sanitized)
+    # Replace spaces and invalid characters, then drop any other problematic character
+    sanitized = _SANITIZE_RE.sub('', name.translate(_SANITIZE_TR))
     # Ensure the filename isn't empty after sanitization
     if not sanitized:
         sanitized = "unnamed_file"
     return sanitized
 
+def claim_file_path(file_path):
+    """
+    Atomically create an empty placeholder at file_path.
+    Returns False if something already exists there.
+    """
+    try:
+        fd = os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+def next_free_suffix(directory, sanitized_name, file_extension):
+    """
+    Smallest counter above every "<sanitized_name>_<n><file_extension>" already in directory,
+    found with a single directory scan instead of one exists() call per counter
+    """
+    prefix = f"{sanitized_name}_"
+    highest = 0
+    with os.scandir(directory or '.') as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith(prefix) and name.endswith(file_extension):
+                counter = name[len(prefix):len(name) - len(file_extension)]
+                # Counters are written as ASCII digits; isdigit() alone also accepts e.g. "²"
+                if counter.isascii() and counter.isdigit():
+                    highest = max(highest, int(counter))
+    return highest + 1
+
 def rename_file_based_on_item_details(file_path, item_details):
     """
     Rename a file based on the name in item_details without changing the extension
@@ -47,16 +78,25 @@ def rename_file_based_on_item_details(file_path, item_details):
     # Create the new file path
     new_file_path = os.path.join(directory, new_filename)
     
-    # If the new path already exists, add a numeric suffix
-    counter = 1
-    while os.path.exists(new_file_path):
-        new_filename = f"{sanitized_name}_{counter}{file_extension}"
-        new_file_path = os.path.join(directory, new_filename)
-        counter += 1
-    
     # Perform the actual file renaming
     try:
-        os.rename(file_path, new_file_path)
+        # Claim the target name with O_EXCL so concurrent uploads can't pick the same one
+        if not claim_file_path(new_file_path):
+            # If the new path already exists, add a numeric suffix
+            counter = next_free_suffix(directory, sanitized_name, file_extension)
+            while True:
+                new_filename = f"{sanitized_name}_{counter}{file_extension}"
+                new_file_path = os.path.join(directory, new_filename)
+                if claim_file_path(new_file_path):
+                    break
+                counter += 1
+        
+        # Replace the placeholder with the uploaded file
+        try:
+            os.replace(file_path, new_file_path)
+        except OSError:
+            os.remove(new_file_path)
+            raise
         return new_file_path
     except OSError as e:
         print(f"Error renaming file: {e}")
@@ -0,0 +1,53 @@
+from flask import Request
+import os
+import shutil
+import tempfile
+
+class DiskUploadRequest(Request):
+    """
+    Request that parses uploaded files of selected endpoints straight to disk.
+    
+    Werkzeug normally spools every file part into a temporary file that the view
+    then copies to its destination. For endpoints in disk_upload_endpoints the
+    multipart parser writes into upload_tmp_folder instead, and save_upload()
+    renames the file into place, so the data is written only once.
+    """
+    upload_tmp_folder = None
+    disk_upload_endpoints = ()
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.disk_upload_paths = []
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        """Open the file a multipart file part is parsed into"""
+        if self.upload_tmp_folder is None or self.endpoint not in self.disk_upload_endpoints:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        
+        stream = tempfile.NamedTemporaryFile('wb+', dir=self.upload_tmp_folder, prefix='upload_', delete=False)
+        self.disk_upload_paths.append(stream.name)
+        return stream
+    
+    def save_upload(self, file, destination, length=1 << 20):
+        """Move an uploaded file to destination, renaming it when it was parsed to disk"""
+        path = getattr(file.stream, 'name', None)
+        if path in self.disk_upload_paths:
+            file.stream.close()
+            # Temporary files are private; give it the usual permissions of a saved upload
+            os.chmod(path, 0o644)
+            # A rename on the same filesystem, a copy otherwise
+            shutil.move(path, destination)
+            self.disk_upload_paths.remove(path)
+            return
+        
+        with open(destination, 'wb') as dst:
+            shutil.copyfileobj(file.stream, dst, length=length)
+    
+    def remove_disk_uploads(self):
+        """Delete parsed files that were never saved"""
+        for path in self.disk_upload_paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.disk_upload_paths = []
@@ -0,0 +1,37 @@
+from flask.json.provider import JSONProvider
+import json
+import orjson
+
+def _dumps_bytes(obj):
+    """
+    Serialize obj to JSON bytes with orjson. orjson rejects str with lone surrogates,
+    which os.scandir returns for file names that aren't valid UTF-8, so those
+    payloads fall back to the stdlib encoder, which escapes them like Flask's default.
+    """
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        return json.dumps(obj).encode()
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a JSON string"""
+        return _dumps_bytes(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        """Deserialize a JSON string or bytes"""
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Lone surrogate escapes such as "\udcff" are valid for the stdlib parser only
+            return json.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build a JSON response straight from the orjson bytes"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            _dumps_bytes(obj),
+            mimetype='application/json'
+        )
@@ -1,40 +1,176 @@
 import os
+import sys
 import shutil
 import zipfile
 import io
+import time
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
-from datetime import datetime
-import requests
+
+# Turns an item name into the name part of an upload folder (whitespace and separators to "_")
+_SLUG_TR = str.maketrans(' \t\n/\\', '_____')
+
+# Threads decompressing ZIP members at once (zlib releases the GIL). This only helps with
+# OS threads (gunicorn sync/gthread workers), not under gevent; see threads_are_greenlets
+ZIP_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Buffer size used when writing uploaded or extracted data to disk
+COPY_BUFSIZE = 1 << 20
+
+def make_upload_folder_name(item_name, item_id):
+    """Build a unique folder name "<item_name>_<item_id>_<time_ns>" for an upload"""
+    return f"{item_name.translate(_SLUG_TR).lower()}_{item_id}_{time.time_ns()}"
+
+def threads_are_greenlets():
+    """
+    True when gevent has monkey-patched threading, as wsgi.py does for the gevent
+    worker. Threads are greenlets then, and zlib and file writes never yield, so a
+    thread pool runs CPU-bound work one item at a time and only adds overhead.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
 
 def ensure_directory_exists(directory):
     """Create directory if it doesn't exist"""
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    os.makedirs(directory, exist_ok=True)
+
+def zip_member_path(info):
+    """Relative path a ZIP member extracts to, sanitized the same way as ZipFile.extract"""
+    arcname = os.path.splitdrive(info.filename.replace('/', os.sep))[1]
+    invalid = ('', os.curdir, os.pardir)
+    return os.sep.join(part for part in arcname.split(os.sep) if part not in invalid)
 
 def extract_zip_folder(zip_file, destination_path):
     """Extract a ZIP file to the destination path"""
-    # Create a ZipFile object from the uploaded file
-    zip_obj = zipfile.ZipFile(zip_file)
+    with zipfile.ZipFile(zip_file) as zip_obj:
+        # Create every directory up front so the workers below only write files
+        members = {}
+        created_dirs = set()
+        for info in zip_obj.infolist():
+            relative_path = zip_member_path(info)
+            if not relative_path:
+                continue
+            dir_name = os.path.join(destination_path, relative_path if info.is_dir() else os.path.dirname(relative_path))
+            if dir_name not in created_dirs:
+                ensure_directory_exists(dir_name)
+                created_dirs.add(dir_name)
+            if not info.is_dir():
+                # A name repeated in the archive is one file on disk; the last entry wins
+                members[relative_path] = info
+        
+        def extract_member(item):
+            relative_path, info = item
+            with zip_obj.open(info) as source, open(os.path.join(destination_path, relative_path), 'wb') as target:
+                shutil.copyfileobj(source, target, length=COPY_BUFSIZE)
+        
+        if threads_are_greenlets():
+            for item in members.items():
+                extract_member(item)
+        else:
+            # Members are compressed independently, so OS threads can inflate them in parallel
+            with ThreadPoolExecutor(max_workers=ZIP_EXTRACT_WORKERS) as executor:
+                list(executor.map(extract_member, members.items()))
     
-    # Extract all contents to the destination path
-    zip_obj.extractall(destination_path)
+    # Return list of all extracted files
+    return list(members)
+
+def nest_folder_contents(folder, components):
+    """Move everything currently in folder down into folder/<components...>"""
+    staging = os.path.join(folder, f".nest_{time.time_ns()}")
+    os.mkdir(staging)
     
-    # Close the zip file
-    zip_obj.close()
+    with os.scandir(folder) as entries:
+        names = [entry.name for entry in entries if entry.path != staging]
+    for name in names:
+        os.replace(os.path.join(folder, name), os.path.join(staging, name))
     
-    # Return list of all extracted files
-    extracted_files = []
-    for root, dirs, files in os.walk(destination_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(file_path, destination_path)
-            extracted_files.append(relative_path)
-    
-    return extracted_files
+    target = os.path.join(folder, *components)
+    ensure_directory_exists(os.path.dirname(target))
+    os.replace(staging, target)
+
+def extract_tar_folder(tar, destination_path):
+    """
+    Extract a streamed tar archive into destination_path in a single pass.
+    
+    Leading directories shared by every member are dropped, so an archive made
+    from "/home/cazzano/starter" with one top-level folder lands as the contents
+    of that folder. If a later member shows that less can be stripped, entries
+    already extracted are pushed back down with renames.
+    
+    Directory attributes are applied after every member is extracted, like
+    TarFile.extractall, so read-only directories don't block their contents.
+    
+    Returns the relative paths of the extracted files, in archive order.
+    """
+    prefix = None
+    extracted_any = False
+    # Relative path parts of each extracted file, keyed so duplicates keep their first position
+    extracted_files = {}
+    # (path parts, member) of every directory, whose owner, mode and mtime are set last
+    directories = []
+    
+    for member in tar:
+        parts = [part for part in member.name.split('/') if part and part != '.']
+        if not parts:
+            continue
+        
+        # Directories can be stripped themselves, files only down to their parent
+        strippable = parts if member.isdir() else parts[:-1]
+        if prefix is None or (not extracted_any and strippable[:len(prefix)] == prefix):
+            # Nothing is on disk yet, so the stripped prefix can still grow
+            prefix = strippable
+        else:
+            common = 0
+            while common < len(prefix) and common < len(strippable) and prefix[common] == strippable[common]:
+                common += 1
+            if common < len(prefix):
+                # Only push down what is on disk; until then the prefix just shrinks and may
+                # grow again, and once something is extracted it stays frozen
+                if extracted_any:
+                    nested = prefix[common:]
+                    nest_folder_contents(destination_path, nested)
+                    extracted_files = {tuple(nested) + key: None for key in extracted_files}
+                prefix = prefix[:common]
+        
+        if member.isdir():
+            directories.append((parts, member))
+        
+        relative_parts = parts[len(prefix):]
+        if not relative_parts:
+            # One of the stripped leading directories
+            continue
+        
+        if member.islnk():
+            link_parts = member.linkname.split('/')
+            if link_parts[:len(prefix)] == prefix:
+                member.linkname = '/'.join(link_parts[len(prefix):])
+        member.name = '/'.join(relative_parts)
+        if member.isdir():
+            tar.extract(member, destination_path, set_attrs=False)
+        else:
+            tar.extract(member, destination_path)
+        extracted_any = True
+        if member.isfile() or member.islnk():
+            extracted_files[tuple(relative_parts)] = None
+    
+    # Directories below the final prefix, including stripped ones that were pushed back
+    # down, deepest first; extracting an existing directory again only sets its attributes
+    directories.sort(key=lambda directory: directory[0], reverse=True)
+    for parts, directory in directories:
+        if len(parts) > len(prefix):
+            directory.name = '/'.join(parts[len(prefix):])
+            tar.extract(directory, destination_path)
+    
+    return [os.path.join(*key) for key in extracted_files]
 
-def process_folder_files(files, destination_path):
-    """Process multiple files that represent a folder structure"""
+def process_folder_files(files, destination_path, save_file=None):
+    """
+    Process multiple files that represent a folder structure.
+    save_file(file_obj, path), when given, stores each file instead of FileStorage.save.
+    """
     uploaded_files = []
+    # Directories already created for earlier files of this upload
+    created_dirs = set()
     
     for file_obj in files:
         # Get the file path from the webkitRelativePath attribute
@@ -46,58 +182,66 @@ def process_folder_files(files, destination_path):
         file_path = file_obj.filename
         
         # Create directory structure if needed
-        dir_name = os.path.dirname(os.path.join(destination_path, file_path))
-        if dir_name:
+        full_path = os.path.join(destination_path, file_path)
+        dir_name = os.path.dirname(full_path)
+        if dir_name and dir_name not in created_dirs:
             ensure_directory_exists(dir_name)
+            created_dirs.add(dir_name)
             
-        # Save the file
-        full_path = os.path.join(destination_path, file_path)
-        file_obj.save(full_path)
+        # Save the file (FileStorage.save copies in 16 KiB chunks by default)
+        if save_file is not None:
+            save_file(file_obj, full_path)
+        else:
+            file_obj.save(full_path, buffer_size=COPY_BUFSIZE)
         uploaded_files.append(file_path)
     
     return uploaded_files
 
 def copy_folder_contents(source_folder, destination_folder):
     """Copy a folder and all its contents to the destination folder"""
-    # Ensure destination directory exists
-    ensure_directory_exists(destination_folder)
-    
-    # Copy all contents
     copied_files = []
-    for item in os.listdir(source_folder):
-        source_item = os.path.join(source_folder, item)
-        dest_item = os.path.join(destination_folder, item)
-        
-        if os.path.isdir(source_item):
-            # Recursively copy subdirectories
-            sub_copied = copy_folder_contents(source_item, dest_item)
-            copied_files.extend(sub_copied)
-        else:
-            # Copy file
-            shutil.copy2(source_item, dest_item)
-            copied_files.append(dest_item)
+    
+    def copy_file(source_item, dest_item):
+        # Data only: copyfile uses the kernel's zero-copy path and skips the copystat syscalls
+        shutil.copyfile(source_item, dest_item)
+        copied_files.append(dest_item)
+    
+    # copytree walks with os.scandir and creates the destination directories as needed
+    shutil.copytree(source_folder, destination_folder, copy_function=copy_file, dirs_exist_ok=True)
     
     return copied_files
 
-def update_static_resource(item_id, file_path, api_static_url, file_view_prepath):
-    """Update static resource for a file"""
-    try:
-        # Append prepath to the relative path
-        static_resource_path = f"{file_view_prepath}{file_path}"
-        
-        # Record the file path in the static resources
-        static_resource = {
-            "item_path": static_resource_path
-        }
-        response = requests.put(f"{api_static_url}/update/{item_id}", json=static_resource)
-        return response.status_code == 200, static_resource_path
-    except requests.RequestException as e:
-        # Log the error but continue since the file is already saved
-        print(f"Failed to update static resource: {e}")
-        return False, None
+def record_folder_static_resources(item_id, folder_path, file_paths, upload_folder, update_static_resources, file_view_prepath):
+    """
+    Record a static resource for every file of an uploaded folder.
+    
+    update_static_resources is the app's sender for lists of {"item_id", "item_path"}
+    updates, returning None per successful update; it applies updates for the same
+    item in order, so the item ends up pointing at the last file.
+    """
+    # The folder's path relative to upload_folder is the same for every file
+    folder_rel = os.path.relpath(folder_path, upload_folder)
+    relative_paths = [os.path.join(folder_rel, file_path) for file_path in file_paths]
+    if not relative_paths:
+        return []
+    
+    # Append prepath to the relative paths
+    static_resource_paths = [f"{file_view_prepath}{relative_path}" for relative_path in relative_paths]
+    results = update_static_resources([{"item_id": item_id, "item_path": path} for path in static_resource_paths])
+    
+    uploaded_files = []
+    for relative_path, static_path, result in zip(relative_paths, static_resource_paths, results):
+        if result is not None:
+            # Log the error but continue since the file is already saved
+            print(f"Failed to update static resource: {result[1]}")
+        uploaded_files.append({"file_path": relative_path, "static_path": static_path if result is None else None, "updated": result is None})
+    return uploaded_files
 
-def process_folder_upload(folder_data, item_id, upload_folder, item_details, api_static_url, file_view_prepath):
-    """Process the uploaded folder based on the upload type"""
+def process_folder_upload(folder_data, item_id, upload_folder, item_details, update_static_resources, file_view_prepath, save_file=None):
+    """
+    Process the uploaded folder based on the upload type.
+    update_static_resources sends the static resource updates (see record_folder_static_resources).
+    """
     if not item_details:
         return {"error": f"Could not get details for item ID: {item_id}"}, 404
     
@@ -112,10 +256,8 @@ def process_folder_upload(folder_data, item_id, upload_folder, item_details, api
     dir_path = os.path.join(upload_folder, category, file_type)
     ensure_directory_exists(dir_path)
     
-    # Create a unique subfolder for this upload (using timestamp)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    item_name = item_details.get('name', '').replace(' ', '_').lower()
-    folder_name = f"{item_name}_{item_id}_{timestamp}"
+    # Create a unique subfolder for this upload (nanosecond timestamp, so concurrent uploads don't collide)
+    folder_name = make_upload_folder_name(item_details.get('name', ''), item_id)
     folder_path = os.path.join(dir_path, folder_name)
     ensure_directory_exists(folder_path)
     
@@ -128,38 +270,15 @@ def process_folder_upload(folder_data, item_id, upload_folder, item_details, api
         zip_file = folder_data['zip_file']
         extracted_files = extract_zip_folder(zip_file, folder_path)
         
-        for file_path in extracted_files:
-            full_path = os.path.join(folder_path, file_path)
-            relative_path = os.path.relpath(full_path, upload_folder)
-            
-            # Update static resource
-            success, static_path = update_static_resource(item_id, relative_path, api_static_url, file_view_prepath)
-            
-            uploaded_files.append({
-                "file_path": relative_path,
-                "static_path": static_path,
-                "updated": success
-            })
-            
+        uploaded_files = record_folder_static_resources(item_id, folder_path, extracted_files, upload_folder, update_static_resources, file_view_prepath)
         processed_files = extracted_files
             
     elif 'folder_files' in folder_data:
         # Process directory upload from browser
         folder_files = folder_data['folder_files']
-        processed_files = process_folder_files(folder_files, folder_path)
+        processed_files = process_folder_files(folder_files, folder_path, save_file)
         
-        for file_path in processed_files:
-            full_path = os.path.join(folder_path, file_path)
-            relative_path = os.path.relpath(full_path, upload_folder)
-            
-            # Update static resource
-            success, static_path = update_static_resource(item_id, relative_path, api_static_url, file_view_prepath)
-            
-            uploaded_files.append({
-                "file_path": relative_path,
-                "static_path": static_path,
-                "updated": success
-            })
+        uploaded_files = record_folder_static_resources(item_id, folder_path, processed_files, upload_folder, update_static_resources, file_view_prepath)
     
     return {
         "success": True,
@@ -1,23 +1,69 @@
 import requests
 import json
+import orjson
+import threading
+import time
+from collections import defaultdict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-def fetch_file_info_by_item_id(item_id):
+# Shared session so lookups against the file server reuse keep-alive connections
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=3, backoff_factor=0.1))
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+# Seconds the file server's listing stays valid, indexed by item_id
+FILES_CACHE_TTL = 2.0
+_files_cache = {"t": 0.0, "by_id": None}
+# Held by the one request refreshing an expired listing
+_files_cache_lock = threading.Lock()
+
+# Timeout (connect, read) for calls to the file server
+FILES_API_TIMEOUT = (3, 10)
+
+def fetch_all_files():
     """
-    Fetch file information from external API for the given item_id
+    Fetch the file listing from the external API, grouped by item_id.
+    The result is cached for FILES_CACHE_TTL seconds; failed fetches are not cached.
     """
+    by_id = _files_cache["by_id"]
+    if by_id is not None and time.monotonic() - _files_cache["t"] < FILES_CACHE_TTL:
+        return by_id
+    
+    # Only one request refreshes an expired listing; the others keep using the stale
+    # one meanwhile, and only wait when there is nothing cached yet
+    if not _files_cache_lock.acquire(blocking=by_id is None):
+        return by_id
     try:
-        response = requests.get('http://localhost:3000/files')
+        by_id = _files_cache["by_id"]
+        if by_id is not None and time.monotonic() - _files_cache["t"] < FILES_CACHE_TTL:
+            # Refreshed while this request waited for the lock
+            return by_id
+        
+        response = _session.get('http://localhost:3000/files', timeout=FILES_API_TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
-            # Filter files by item_id
-            matching_files = [file for file in data.get('files', []) if file.get('item_id') == item_id]
-            return matching_files
+            data = orjson.loads(response.content)
+            by_id = defaultdict(list)
+            for file in data.get('files', []):
+                by_id[file.get('item_id')].append(file)
+            _files_cache["by_id"] = by_id
+            _files_cache["t"] = time.monotonic()
+            return by_id
         else:
             print(f"Error fetching from external API: Status code {response.status_code}")
-            return []
+            return {}
     except Exception as e:
         print(f"Exception when fetching file info: {str(e)}")
-        return []
+        return {}
+    finally:
+        _files_cache_lock.release()
+
+def fetch_file_info_by_item_id(item_id):
+    """
+    Fetch file information from external API for the given item_id
+    """
+    return list(fetch_all_files().get(item_id, []))
 
 def get_path_for_item(item_id, add_prepath=True):
     """
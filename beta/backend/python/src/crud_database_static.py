@@ -1,57 +1,72 @@
 import sqlite3
+from flask import g
 
 # Path to the static resources database
 DATABASE_STATIC_PATH = "database/database_static.db"
 
+# Insert a row or update the existing one in a single statement;
+# the "keep" variant leaves an existing item_path alone when the new one is NULL
+UPSERT_STATIC_SQL = """
+    INSERT INTO item_static (item_id, item_path)
+    VALUES (?, ?)
+    ON CONFLICT(item_id) DO UPDATE SET item_path = excluded.item_path
+"""
+UPSERT_STATIC_KEEP_PATH_SQL = """
+    INSERT INTO item_static (item_id, item_path)
+    VALUES (?, ?)
+    ON CONFLICT(item_id) DO UPDATE SET item_path = COALESCE(excluded.item_path, item_path)
+"""
+
+
+def get_connection():
+    """
+    Return the static resources database connection for the current app context,
+    opening it on first use. close_connection() closes it on teardown.
+    """
+    conn = g.get('db_static')
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_STATIC_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        g.db_static = conn
+    return conn
+
+
+def close_connection(exception=None):
+    """
+    Close the static resources database connection of the current app context, if any.
+    """
+    conn = g.pop('db_static', None)
+    if conn is not None:
+        conn.close()
+
 
 def add_item_static(item_id, item_path=None):
     """
     Add static resources for an item to the 'item_static' table.
+    If the item already has static resources they are replaced.
     """
-    conn = sqlite3.connect(DATABASE_STATIC_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            """
-            INSERT INTO item_static (item_id, item_path)
-            VALUES (?, ?)
-        """,
-            (item_id, item_path),
-        )
+        cursor.execute(UPSERT_STATIC_SQL, (item_id, item_path))
         conn.commit()
         return True
-    except sqlite3.IntegrityError:
-        # If record exists, try to update instead
-        try:
-            cursor.execute(
-                """
-                UPDATE item_static 
-                SET item_path = ?
-                WHERE item_id = ?
-            """,
-                (item_path, item_id),
-            )
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error updating static resource: {e}")
-            return False
     except Exception as e:
         print(f"Error adding static resource: {e}")
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def get_item_static(item_id):
     """
     Retrieve static resources for an item by its ID.
     """
-    conn = sqlite3.connect(DATABASE_STATIC_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM item_static WHERE item_id = ?", (item_id,))
     static_data = cursor.fetchone()
-    conn.close()
     return static_data
 
 
@@ -59,11 +74,10 @@ def get_all_items_static():
     """
     Retrieve all static resources from the 'item_static' table.
     """
-    conn = sqlite3.connect(DATABASE_STATIC_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM item_static")
     static_data = cursor.fetchall()
-    conn.close()
     return static_data
 
 
@@ -71,41 +85,41 @@ def update_item_static(item_id, item_path=None):
     """
     Update static resources for an item by its ID.
     """
-    conn = sqlite3.connect(DATABASE_STATIC_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        # Check if record exists
-        cursor.execute("SELECT 1 FROM item_static WHERE item_id = ?", (item_id,))
-        if cursor.fetchone():
-            # Update existing record
-            if item_path is not None:
-                cursor.execute(
-                    "UPDATE item_static SET item_path = ? WHERE item_id = ?",
-                    (item_path, item_id),
-                )
-        else:
-            # Insert new record
-            cursor.execute(
-                """
-                INSERT INTO item_static (item_id, item_path)
-                VALUES (?, ?)
-            """,
-                (item_id, item_path),
-            )
+        cursor.execute(UPSERT_STATIC_KEEP_PATH_SQL, (item_id, item_path))
         conn.commit()
         return True
     except Exception as e:
         print(f"Error updating static resource: {e}")
+        conn.rollback()
+        return False
+
+
+def update_items_static_bulk(rows):
+    """
+    Update static resources for many items in a single transaction.
+    rows is a list of (item_id, item_path) tuples, applied in order.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # One prepared statement bound once per row
+        cursor.executemany(UPSERT_STATIC_KEEP_PATH_SQL, rows)
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error updating static resources: {e}")
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def delete_item_static(item_id):
     """
     Delete static resources for an item by its ID.
     """
-    conn = sqlite3.connect(DATABASE_STATIC_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM item_static WHERE item_id = ?", (item_id,))
@@ -113,16 +127,15 @@ def delete_item_static(item_id):
         return True
     except Exception as e:
         print(f"Error deleting static resource: {e}")
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def create_static_table_if_not_exists():
     """
     Create the 'item_static' table if it doesn't exist yet.
     """
-    conn = sqlite3.connect(DATABASE_STATIC_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS item_static (
@@ -132,4 +145,3 @@ def create_static_table_if_not_exists():
     )
     ''')
     conn.commit()
-    conn.close()
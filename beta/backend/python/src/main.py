@@ -3,8 +3,10 @@ from flask import Flask
 from flask_cors import CORS
 #from create_db import initialize_databases
 from routes import setup_routes
+from json_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Initialize the databases when the app starts
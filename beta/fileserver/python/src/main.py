@@ -1,23 +1,45 @@
 from flask import Flask, request, jsonify, render_template
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import hashlib
+import orjson
 import re
 import tarfile
 import shutil
-from io import BytesIO
-from datetime import datetime
-from difflib import SequenceMatcher
-from serve import setup_file_serving
+import time
+import threading
+from collections import defaultdict
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from rapidfuzz import fuzz
+from serve import setup_file_serving, parse_pagination
 from auto_rename import rename_file_based_on_item_details
-from upload_folder import process_folder_upload
+from upload_folder import process_folder_upload, extract_tar_folder, make_upload_folder_name
+from json_provider import OrjsonProvider
+from disk_upload import DiskUploadRequest
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Base directory to store uploaded files
 UPLOAD_FOLDER = 'db'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Files sent to /upload and /upload-folder are parsed straight into this folder and then renamed into
+# UPLOAD_FOLDER; it sits next to it so the rename stays on the same filesystem
+UPLOAD_TMP_FOLDER = 'db_incoming'
+os.makedirs(UPLOAD_TMP_FOLDER, exist_ok=True)
+DiskUploadRequest.upload_tmp_folder = UPLOAD_TMP_FOLDER
+DiskUploadRequest.disk_upload_endpoints = ('upload_file', 'upload_folder')
+app.request_class = DiskUploadRequest
+
+@app.teardown_request
+def remove_unsaved_uploads(exception=None):
+    """Delete parsed upload files the request did not keep"""
+    request.remove_disk_uploads()
 
 # API endpoint for items
 API_BASE_URL = 'http://localhost:5000/items'
@@ -26,44 +48,203 @@ API_STATIC_URL = 'http://localhost:5000/items/static'
 # URL prepath for file viewing
 FILE_VIEW_PREPATH = 'http://localhost:3000/files/view/'
 
+# Buffer size used when writing uploaded data to disk
+COPY_BUFSIZE = 1 << 20
+
+# Timeout (connect, read) for calls to the items API
+API_TIMEOUT = (3, 10)
+API_BULK_TIMEOUT = (3, 30)
+
+# Concurrent PUTs when the items API has no bulk update endpoint
+STATIC_UPDATE_WORKERS = 16
+
+# Runs static resource updates that a response doesn't wait for
+_background_executor = ThreadPoolExecutor(max_workers=8)
+
+# Shared session so calls to the items API reuse keep-alive connections
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=50, pool_maxsize=50, max_retries=Retry(total=3, backoff_factor=0.1))
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+
+# Patterns used to pull an item_id out of a filename
+_ID_PATTERNS = [
+    re.compile(r'item[_-]?(\d+)'),  # matches "item_123", "item-123", "item123"
+    re.compile(r'(\d+)[_-]'),        # matches "123_something", "123-something"
+    re.compile(r'^(\d+)$'),          # matches just the number itself
+]
+
+# Files per bulk update request in sync_static_resources
+SYNC_BATCH_SIZE = 500
+
+# Most per-file problems reported back by sync_static_resources
+MAX_REPORTED_ERRORS = 100
+
+# Seconds a fetched item list / static resource list stays valid
+CACHE_TTL = 5.0
+# Once expired, a list is revalidated with its ETag so an unchanged list costs a 304
+_items_cache = {"t": 0.0, "v": None, "etag": None, "lock": threading.Lock()}
+_static_cache = {"t": 0.0, "v": None, "etag": None, "lock": threading.Lock()}
+
+# Seconds clients may reuse a /files listing before revalidating it
+FILES_LISTING_MAX_AGE = 5
+# (ETag, body) of the last /files response whose inputs could be identified by an ETag;
+# replaced as one tuple so concurrent requests never pair a tag with another body
+_files_listing_cache = {"entry": (None, None)}
+
+def _iter_files(root, dir_rel='', dir_parts=()):
+    """
+    Recursively yield (dir_rel, dir_parts, name) for every file under root using os.scandir.
+    dir_rel is the file's directory relative to root (with a trailing separator, or empty)
+    and dir_parts its path components; both are built once per directory while recursing.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                name = entry.name
+                yield from _iter_files(entry.path, dir_rel + name + os.sep, dir_parts + (name,))
+            elif entry.is_file(follow_symlinks=False):
+                yield dir_rel, dir_parts, entry.name
+
+def _cache_get(cache):
+    """Return the cached value if it is still fresh, otherwise None"""
+    if cache["v"] is not None and time.monotonic() - cache["t"] < CACHE_TTL:
+        return cache["v"]
+    return None
+
+def _cache_set(cache, value):
+    """Store a freshly fetched value in the cache"""
+    cache["t"] = time.monotonic()
+    cache["v"] = value
+    return value
+
+def invalidate_cache():
+    """Expire the cached items and static resources so the next call revalidates them"""
+    expired = time.monotonic() - CACHE_TTL
+    _items_cache["t"] = expired
+    _static_cache["t"] = expired
+
+def _cache_etag(cache, value):
+    """ETag the API sent for value, or None if value is not the cached list or it is being refreshed"""
+    if not cache["lock"].acquire(blocking=False):
+        return None
+    try:
+        return cache["etag"] if value is cache["v"] else None
+    finally:
+        cache["lock"].release()
+
+def _fetch_items_list(cache, url):
+    """
+    Fetch a list from the items API and return it as a dictionary keyed by item_id.
+    Fresh results come from cache; expired ones are revalidated with If-None-Match.
+    """
+    cached = _cache_get(cache)
+    if cached is not None:
+        return cached
+    
+    # Only one request revalidates an expired list; the others keep using the stale
+    # one meanwhile, and only wait when there is nothing cached yet
+    if not cache["lock"].acquire(blocking=cache["v"] is None):
+        return cache["v"]
+    try:
+        cached = _cache_get(cache)
+        if cached is not None:
+            # Refreshed while this request waited for the lock
+            return cached
+        
+        headers = {}
+        if cache["v"] is not None and cache["etag"]:
+            headers["If-None-Match"] = cache["etag"]
+        
+        response = _session.get(url, headers=headers, timeout=API_TIMEOUT)
+        if response.status_code == 304:
+            # Unchanged since the last fetch, keep the dictionary we already built
+            return _cache_set(cache, cache["v"])
+        if response.status_code == 200:
+            # Convert the list to a dictionary with item_id as key
+            items_list = orjson.loads(response.content)
+            cache["etag"] = response.headers.get("ETag")
+            return _cache_set(cache, {item['item_id']: item for item in items_list})
+        return {}
+    except (requests.RequestException, orjson.JSONDecodeError):
+        return {}
+    finally:
+        cache["lock"].release()
+
+def _put_static_resource(update):
+    """PUT a single static resource update, returning None on success or (status, error)"""
+    try:
+        response = _session.put(
+            f"{API_STATIC_URL}/update/{update['item_id']}",
+            json={"item_path": update["item_path"]},
+            timeout=API_TIMEOUT
+        )
+        if response.status_code == 200:
+            return None
+        return "update_failed", response.text
+    except requests.RequestException as e:
+        return "error", str(e)
+
+def update_static_resources(updates):
+    """
+    Send a list of {"item_id", "item_path"} static resource updates to the API.
+    
+    Everything goes in one bulk request. If the API has no bulk endpoint the
+    per-item PUTs are dispatched concurrently over the shared session instead;
+    updates for the same item are still sent in order so the last one wins.
+    Returns one entry per update: None on success, otherwise (status, error).
+    """
+    try:
+        response = _session.post(f"{API_STATIC_URL}/bulk_update", json={"updates": updates}, timeout=API_BULK_TIMEOUT)
+    except requests.RequestException as e:
+        return [("error", str(e))] * len(updates)
+    
+    if response.status_code == 200:
+        return [None] * len(updates)
+    if response.status_code not in (404, 405):
+        return [("update_failed", response.text)] * len(updates)
+    
+    # Older API without the bulk endpoint
+    by_item = defaultdict(list)
+    for index, update in enumerate(updates):
+        by_item[update["item_id"]].append(index)
+    
+    results = [None] * len(updates)
+    
+    def put_in_order(indexes):
+        for index in indexes:
+            results[index] = _put_static_resource(updates[index])
+    
+    with ThreadPoolExecutor(max_workers=STATIC_UPDATE_WORKERS) as executor:
+        list(executor.map(put_in_order, by_item.values()))
+    return results
+
 def get_item_details(item_id):
     """Fetch item details from the API based on item ID"""
     try:
-        response = requests.get(f"{API_BASE_URL}/{item_id}")
+        response = _session.get(f"{API_BASE_URL}/{item_id}", timeout=API_TIMEOUT)
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
         else:
             return None
-    except requests.RequestException:
+    except (requests.RequestException, orjson.JSONDecodeError):
         return None
 
 def get_all_items():
     """Function to get all available items from the API"""
-    try:
-        response = requests.get(API_BASE_URL)
-        if response.status_code == 200:
-            # Convert the list of items to a dictionary with item_id as key
-            items_list = response.json()
-            items_dict = {item['item_id']: item for item in items_list}
-            return items_dict
-        else:
-            return {}
-    except requests.RequestException:
-        return {}
+    return _fetch_items_list(_items_cache, API_BASE_URL)
 
 def get_all_static_resources():
     """Function to get all static resources from the API"""
-    try:
-        response = requests.get(API_STATIC_URL)
-        if response.status_code == 200:
-            # Convert the list to a dictionary with item_id as key
-            static_list = response.json()
-            static_dict = {item['item_id']: item for item in static_list}
-            return static_dict
-        else:
-            return {}
-    except requests.RequestException:
-        return {}
+    return _fetch_items_list(_static_cache, API_STATIC_URL)
+
+def _name_similarity(filename_base, item_name_lower):
+    """
+    Similarity ratio (0..1) between two already normalized names, computed in C++ by RapidFuzz.
+    This is the Indel (LCS) ratio, not difflib's Ratcliff-Obershelp matching, so scores can
+    be higher than SequenceMatcher's when the common characters are not contiguous.
+    """
+    return fuzz.ratio(filename_base, item_name_lower) / 100.0
 
 def calculate_filename_similarity(filename, item_name):
     """Calculate similarity between filename and item name"""
@@ -72,80 +253,105 @@ def calculate_filename_similarity(filename, item_name):
     item_name_lower = item_name.lower()
     
     # Calculate similarity ratio
-    return SequenceMatcher(None, filename_base, item_name_lower).ratio()
+    return _name_similarity(filename_base, item_name_lower)
 
-def predict_item_id(file_path, file_name, items_dict, static_resources):
+def build_prediction_index(items_dict, static_resources):
     """
-    Enhanced prediction of item_id based on multiple factors:
-    1. Check if file path matches any stored static resource paths
-    2. Match based on category, type, and name similarity
-    3. Use filename pattern matching if available
+    Precompute the lookups used by predict_item_id once per request:
+    1. Items bucketed by (category, type), as (item_id, lowercased name,
+       lowercased details, distinct details words) so nothing is re-lowered per file
+    2. Registered static resource paths (without prepath) mapped to their item_id
+    3. The same paths grouped by file name, for stored paths that only end with
+       the relative path (e.g. saved with a different host or prefix)
     """
-    # First check if the file path is already registered in static resources
+    buckets = defaultdict(list)
+    for item_id, item in items_dict.items():
+        details = item.get('details', '')
+        if details and isinstance(details, str):
+            details_lower = details.lower()
+            details_parts = tuple(dict.fromkeys(details_lower.split()))
+        else:
+            details_lower = None
+            details_parts = ()
+        buckets[(item.get('category'), item.get('type'))].append(
+            (item_id, (item.get('name') or '').lower(), details_lower, details_parts)
+        )
+    
+    static_by_path = {}
+    static_by_name = defaultdict(list)
     for item_id, resource in static_resources.items():
         resource_path = resource.get('item_path')
         if resource_path:
             # Strip the prepath if it exists in the stored path
             if resource_path.startswith(FILE_VIEW_PREPATH):
                 resource_path = resource_path[len(FILE_VIEW_PREPATH):]
-            
-            if file_path in resource_path:
-                return item_id
+            static_by_path.setdefault(resource_path, item_id)
+            static_by_name[resource_path.rpartition('/')[2]].append((resource_path, item_id))
+    
+    return buckets, static_by_path, static_by_name
+
+def predict_item_id(file_path, file_name, buckets, static_by_path, static_by_name, path_parts=None):
+    """
+    Enhanced prediction of item_id based on multiple factors:
+    1. Check if file path matches any stored static resource paths
+    2. Match based on category, type, and name similarity
+    3. Use filename pattern matching if available
+    
+    buckets, static_by_path and static_by_name come from build_prediction_index.
+    path_parts can be passed when the caller already has the split file_path.
+    """
+    # First check if the file path is already registered in static resources
+    item_id = static_by_path.get(file_path)
+    if item_id is not None:
+        return item_id
+    for resource_path, item_id in static_by_name.get(file_name, ()):
+        if resource_path.endswith(file_path):
+            return item_id
     
     # Parse path components
-    path_parts = file_path.split(os.sep)
+    if path_parts is None:
+        path_parts = file_path.split(os.sep)
     if len(path_parts) < 2:
         return None
     
     category = path_parts[0]
     file_type = path_parts[1]
     
-    # Filter items by category and type
-    candidates = []
-    for item_id, item in items_dict.items():
-        if item.get('category') == category and item.get('type') == file_type:
-            # Calculate name similarity
-            similarity = calculate_filename_similarity(file_name, item.get('name', ''))
-            
-            # Extract item_id from filename if it matches pattern like "item_123" or "123_something"
-            id_in_filename = None
-            filename_base = os.path.splitext(file_name)[0]
-            
-            # Try to extract item_id from filename using common patterns
-            id_patterns = [
-                r'item[_-]?(\d+)',  # matches "item_123", "item-123", "item123"
-                r'(\d+)[_-]',        # matches "123_something", "123-something"
-                r'^(\d+)$'           # matches just the number itself
-            ]
-            
-            for pattern in id_patterns:
-                match = re.search(pattern, filename_base)
-                if match:
-                    try:
-                        id_in_filename = int(match.group(1))
-                        # If we found an ID that matches an actual item_id, give it high priority
-                        if id_in_filename == item_id:
-                            similarity += 0.5  # Boost similarity for ID match
-                    except ValueError:
-                        pass
-            
-            # Check item details for additional clues
-            details = item.get('details', '')
-            if details and isinstance(details, str):
-                # If details contain any portion of the filename or vice versa
-                if file_name.lower() in details.lower() or any(part.lower() in file_name.lower() for part in details.lower().split()):
-                    similarity += 0.3  # Boost for details match
-            
-            candidates.append((item_id, similarity))
+    # The filename without extension is the same for every candidate
+    filename_base = os.path.splitext(file_name)[0]
+    filename_base_lower = filename_base.lower()
+    file_name_lower = file_name.lower()
     
-    # Sort candidates by similarity score
-    candidates.sort(key=lambda x: x[1], reverse=True)
+    # Extract item ids from filename if it matches pattern like "item_123" or "123_something"
+    # Each pattern that finds the candidate's id boosts it, so keep one entry per match
+    ids_in_filename = []
+    for pattern in _ID_PATTERNS:
+        match = pattern.search(filename_base)
+        if match:
+            ids_in_filename.append(int(match.group(1)))
     
-    # Return the item_id with highest similarity if we have candidates
-    if candidates:
-        return candidates[0][0]
+    # Only score items with a matching category and type, keeping the best so far
+    # (the first one wins ties, as with the stable sort this replaces)
+    best_item_id = None
+    best_similarity = None
+    for item_id, name_lower, details_lower, details_parts in buckets.get((category, file_type), ()):
+        # Calculate name similarity
+        similarity = _name_similarity(filename_base_lower, name_lower)
+        
+        # If we found an ID that matches an actual item_id, give it high priority
+        similarity += 0.5 * ids_in_filename.count(item_id)  # Boost similarity for ID match
+        
+        # Check item details for additional clues
+        if details_lower is not None:
+            # If details contain any portion of the filename or vice versa
+            if file_name_lower in details_lower or any(part in file_name_lower for part in details_parts):
+                similarity += 0.3  # Boost for details match
+        
+        if best_similarity is None or similarity > best_similarity:
+            best_item_id, best_similarity = item_id, similarity
     
-    return None
+    # Return the item_id with highest similarity, or None if there were no candidates
+    return best_item_id
 
 @app.route('/items/<int:item_id>', methods=['GET'])
 def get_items(item_id):
@@ -159,14 +365,30 @@ def get_items(item_id):
     else:
         return jsonify({"error": "Item not found"}), 404
 
+def record_static_resources(updates):
+    """Update static resources without a waiting caller, logging failures"""
+    for result in update_static_resources(updates):
+        if result is not None:
+            # Log the error but continue since the file is already saved
+            print(f"Failed to update static resource: {result[1]}")
+    
+    # Make sure the next listing sees the new file's static resource
+    invalidate_cache()
+
 @app.route('/upload/<int:item_id>', methods=['POST'])
 def upload_file(item_id):
-    """Upload file for a specific item ID"""
+    """
+    Upload file for a specific item ID
+    
+    Several files can be sent as repeated "file" parts; their static resources are
+    updated in one request and the item ends up pointing at the last one. The
+    top-level fields describe that last file and "files" lists all of them.
+    """
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     
-    file = request.files['file']
-    if file.filename == '':
+    files = [file for file in request.files.getlist('file') if file.filename != '']
+    if not files:
         return jsonify({"error": "No selected file"}), 400
     
     # Get item details from the API
@@ -184,39 +406,41 @@ def upload_file(item_id):
     
     # Create directory structure
     dir_path = os.path.join(UPLOAD_FOLDER, category, file_type)
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path)
-    
-    # Save the file with original name first
-    original_file_path = os.path.join(dir_path, file.filename)
-    file.save(original_file_path)
+    os.makedirs(dir_path, exist_ok=True)
     
-    # Rename the file according to item details name
-    renamed_file_path = rename_file_based_on_item_details(original_file_path, item_details)
-    
-    # Get the new relative path after renaming
-    relative_path = os.path.relpath(renamed_file_path, UPLOAD_FOLDER)
-    
-    try:
-        # Append prepath to the relative path
-        static_resource_path = f"{FILE_VIEW_PREPATH}{relative_path}"
+    uploaded_files = []
+    for file in files:
+        # Save the file with original name first
+        original_file_path = os.path.join(dir_path, file.filename)
+        request.save_upload(file, original_file_path, length=COPY_BUFSIZE)
         
-        # Record the file path in the static resources
-        static_resource = {
-            "item_path": static_resource_path
-        }
-        requests.put(f"{API_STATIC_URL}/update/{item_id}", json=static_resource)
-    except requests.RequestException as e:
-        # Log the error but continue since the file is already saved
-        print(f"Failed to update static resource: {e}")
+        # Rename the file according to item details name
+        renamed_file_path = rename_file_based_on_item_details(original_file_path, item_details)
+        
+        # Get the new relative path after renaming
+        relative_path = os.path.relpath(renamed_file_path, UPLOAD_FOLDER)
+        
+        uploaded_files.append({
+            "original_filename": file.filename,
+            "new_filename": os.path.basename(renamed_file_path),
+            "path": renamed_file_path,
+            # Append prepath to the relative path
+            "static_path": f"{FILE_VIEW_PREPATH}{relative_path}"
+        })
     
+    # Record the file paths in the static resources in the background; the response doesn't report it
+    updates = [{"item_id": item_id, "item_path": uploaded["static_path"]} for uploaded in uploaded_files]
+    _background_executor.submit(record_static_resources, updates)
+    
+    last_file = uploaded_files[-1]
     return jsonify({
         "success": True,
         "message": f"File uploaded and renamed successfully for item {item_id}",
-        "original_filename": file.filename,
-        "new_filename": os.path.basename(renamed_file_path),
-        "path": renamed_file_path,
-        "static_path": f"{FILE_VIEW_PREPATH}{relative_path}",
+        "original_filename": last_file["original_filename"],
+        "new_filename": last_file["new_filename"],
+        "path": last_file["path"],
+        "static_path": last_file["static_path"],
+        "files": uploaded_files,
         "item_details": item_details
     })
 
@@ -238,9 +462,10 @@ def upload_folder(item_id):
             item_id, 
             UPLOAD_FOLDER, 
             item_details, 
-            API_STATIC_URL, 
+            update_static_resources, 
             FILE_VIEW_PREPATH
         )
+        invalidate_cache()
         
         return jsonify(result), status_code
     
@@ -259,9 +484,11 @@ def upload_folder(item_id):
             item_id, 
             UPLOAD_FOLDER, 
             item_details, 
-            API_STATIC_URL, 
-            FILE_VIEW_PREPATH
+            update_static_resources, 
+            FILE_VIEW_PREPATH,
+            save_file=request.save_upload
         )
+        invalidate_cache()
         
         return jsonify(result), status_code
     else:
@@ -284,126 +511,57 @@ def upload_folder_direct(item_id):
     
     # Create base directory structure
     base_dir_path = os.path.join(UPLOAD_FOLDER, category, file_type)
-    if not os.path.exists(base_dir_path):
-        os.makedirs(base_dir_path)
+    os.makedirs(base_dir_path, exist_ok=True)
     
-    # Create a unique subfolder for this upload (using timestamp)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    item_name = item_details.get('name', '').replace(' ', '_').lower()
-    folder_name = f"{item_name}_{item_id}_{timestamp}"
+    # Create a unique subfolder for this upload (nanosecond timestamp, so concurrent uploads don't collide)
+    folder_name = make_upload_folder_name(item_details.get('name', ''), item_id)
     folder_path = os.path.join(base_dir_path, folder_name)
     os.makedirs(folder_path, exist_ok=True)
     
     try:
-        # Create a temporary directory to extract files first
-        temp_extract_dir = os.path.join(base_dir_path, f"temp_{timestamp}")
-        os.makedirs(temp_extract_dir, exist_ok=True)
+        # Read the tar straight from the request body instead of buffering it in memory
+        tar = tarfile.open(fileobj=request.stream, mode='r|*', bufsize=COPY_BUFSIZE, copybufsize=COPY_BUFSIZE)  # Auto-detect compression
         
-        # Open tar stream from request data
-        tar_stream = BytesIO(request.data)
-        tar = tarfile.open(fileobj=tar_stream, mode='r|*')  # Auto-detect compression
-        
-        # Extract all files to temporary directory
-        tar.extractall(path=temp_extract_dir)
+        # Extract straight into the destination, dropping shared leading directories
+        # For example, from "/home/cazzano/starter", we want just the contents of "starter"
+        extracted_files = extract_tar_folder(tar, folder_path)
         tar.close()
         
-        # Find the actual target folder in the extracted content
-        # We assume the last directory in the path is the one we want to keep
-        # For example, from "/home/cazzano/starter", we want just "starter"
+        # Build the file list and static resource updates from what was extracted
+        folder_rel = os.path.relpath(folder_path, UPLOAD_FOLDER)
         uploaded_files = []
-        source_folders = []
+        updates = []
+        for file_rel in extracted_files:
+            relative_path = os.path.join(folder_rel, file_rel)
+            updates.append({
+                "item_id": item_id,
+                "item_path": f"{FILE_VIEW_PREPATH}{relative_path}"
+            })
+            uploaded_files.append({"file_path": relative_path})
         
-        # Scan the temp directory to find all top-level directories
-        for item in os.listdir(temp_extract_dir):
-            item_path = os.path.join(temp_extract_dir, item)
-            if os.path.isdir(item_path):
-                source_folders.append(item_path)
+        # Update all static resources, in one request when the API supports it
+        results = update_static_resources(updates) if updates else []
         
-        # If we have exactly one top-level directory, assume it's the source folder
-        if len(source_folders) == 1:
-            source_dir = source_folders[0]
-            
-            # Now find the actual target folder by traversing the directory structure
-            current_dir = source_dir
-            found_target = False
-            
-            # Keep traversing until we find a directory with multiple files/subdirectories
-            # or reach a leaf directory
-            while not found_target:
-                contents = os.listdir(current_dir)
-                
-                # If there's only one subdirectory and no files, continue traversing
-                if len(contents) == 1:
-                    next_item = os.path.join(current_dir, contents[0])
-                    if os.path.isdir(next_item):
-                        current_dir = next_item
-                    else:
-                        # Hit a file, use the parent directory
-                        found_target = True
-                else:
-                    # Found a directory with multiple items or no items
-                    found_target = True
-            
-            # Move the contents of the final target directory to our destination
-            for item in os.listdir(current_dir):
-                src_path = os.path.join(current_dir, item)
-                dest_path = os.path.join(folder_path, item)
-                
-                if os.path.isdir(src_path):
-                    shutil.copytree(src_path, dest_path)
-                else:
-                    shutil.copy2(src_path, dest_path)
-        else:
-            # If we have multiple or no top-level directories, just copy everything
-            for item in os.listdir(temp_extract_dir):
-                src_path = os.path.join(temp_extract_dir, item)
-                dest_path = os.path.join(folder_path, item)
-                
-                if os.path.isdir(src_path):
-                    shutil.copytree(src_path, dest_path)
-                else:
-                    shutil.copy2(src_path, dest_path)
+        for uploaded_file, update, result in zip(uploaded_files, updates, results):
+            success = result is None
+            uploaded_file["static_path"] = update["item_path"] if success else None
+            uploaded_file["updated"] = success
         
-        # Clean up temporary directory
-        shutil.rmtree(temp_extract_dir)
-        
-        # Track uploaded files and update static resources
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, UPLOAD_FOLDER)
-                
-                # Update static resource
-                try:
-                    static_resource_path = f"{FILE_VIEW_PREPATH}{relative_path}"
-                    static_resource = {
-                        "item_path": static_resource_path
-                    }
-                    response = requests.put(f"{API_STATIC_URL}/update/{item_id}", json=static_resource)
-                    success = response.status_code == 200
-                except requests.RequestException:
-                    success = False
-                
-                uploaded_files.append({
-                    "file_path": relative_path,
-                    "static_path": static_resource_path if success else None,
-                    "updated": success
-                })
+        # Make sure the next listing sees the new static resources
+        invalidate_cache()
         
         return jsonify({
             "success": True,
             "message": f"Folder uploaded successfully for item {item_id}",
-            "folder_path": os.path.relpath(folder_path, UPLOAD_FOLDER),
+            "folder_path": folder_rel,
             "files": uploaded_files,
             "files_count": len(uploaded_files),
             "item_details": item_details
         })
     
     except Exception as e:
-        # Clean up temporary directory if it exists
-        temp_extract_dir = os.path.join(base_dir_path, f"temp_{timestamp}")
-        if os.path.exists(temp_extract_dir):
-            shutil.rmtree(temp_extract_dir)
+        # Clean up the partially extracted folder
+        shutil.rmtree(folder_path, ignore_errors=True)
             
         return jsonify({
             "success": False,
@@ -416,107 +574,177 @@ def upload_form(item_id):
     """Render an HTML form for direct folder upload"""
     return render_template('upload_form.html', item_id=item_id)
 
+def _files_listing_tag(files, has_more, limit, offset, all_items, static_resources):
+    """
+    ETag for a /files response: a digest of the listed paths, the requested window and
+    the ETags of the item lists the predictions were made from. Returns None when an
+    item list did not come from the API with an ETag, since the payload can't be keyed then.
+    """
+    items_etag = _cache_etag(_items_cache, all_items)
+    static_etag = _cache_etag(_static_cache, static_resources)
+    if not items_etag or not static_etag:
+        return None
+    
+    digest = hashlib.md5(f"{items_etag}|{static_etag}|{offset}|{limit}|{has_more}".encode())
+    for dir_rel, _, file in files:
+        digest.update((dir_rel + file + '\0').encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
 @app.route('/files', methods=['GET'])
 def list_files():
     """List all uploaded files with their paths and corresponding item_ids"""
-    all_files = []
+    try:
+        limit, offset = parse_pagination(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     all_items = get_all_items()
     static_resources = get_all_static_resources()
     
-    for root, dirs, files in os.walk(UPLOAD_FOLDER):
-        for file in files:
-            file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(file_path, UPLOAD_FOLDER)
-            
-            # Use enhanced prediction to determine the item_id
-            item_id = predict_item_id(relative_path, file, all_items, static_resources)
-            
-            file_info = {
-                "path": relative_path,
-                "file_name": file,
-                "item_id": item_id
-            }
-            
-            # If we have a predicted item_id, add item details for reference
-            if item_id and item_id in all_items:
-                file_info["item_name"] = all_items[item_id].get('name')
-                file_info["category"] = all_items[item_id].get('category')
-                file_info["type"] = all_items[item_id].get('type')
-            
-            all_files.append(file_info)
+    # With ?limit= the walk stops one file past the window, which tells whether more follow
+    files = _iter_files(UPLOAD_FOLDER)
+    if limit is not None or offset:
+        files = islice(files, offset, None if limit is None else offset + limit + 1)
+    files = list(files)
+    has_more = limit is not None and len(files) > limit
+    if has_more:
+        del files[limit:]
     
-    return jsonify({
+    # Listing the tree is cheap next to predicting every file's item, so an unchanged
+    # listing is answered with the body built last time (or a 304 for a matching If-None-Match)
+    tag = _files_listing_tag(files, has_more, limit, offset, all_items, static_resources)
+    cached_tag, cached_body = _files_listing_cache["entry"]
+    if tag is not None and tag == cached_tag:
+        response = app.response_class(cached_body, mimetype='application/json')
+    else:
+        response = jsonify(build_files_listing(files, has_more, limit, offset, all_items, static_resources))
+        if tag is not None:
+            _files_listing_cache["entry"] = (tag, response.get_data())
+    
+    if tag is not None:
+        response.set_etag(tag)
+        response.cache_control.max_age = FILES_LISTING_MAX_AGE
+    return response.make_conditional(request)
+
+def build_files_listing(files, has_more, limit, offset, all_items, static_resources):
+    """Build the /files payload for (dir_rel, dir_parts, name) entries from _iter_files"""
+    all_files = []
+    buckets, static_by_path, static_by_name = build_prediction_index(all_items, static_resources)
+    
+    for dir_rel, dir_parts, file in files:
+        relative_path = dir_rel + file
+        
+        # Use enhanced prediction to determine the item_id
+        item_id = predict_item_id(relative_path, file, buckets, static_by_path, static_by_name, dir_parts + (file,))
+        
+        file_info = {
+            "path": relative_path,
+            "file_name": file,
+            "item_id": item_id
+        }
+        
+        # If we have a predicted item_id, add item details for reference
+        if item_id and item_id in all_items:
+            file_info["item_name"] = all_items[item_id].get('name')
+            file_info["category"] = all_items[item_id].get('category')
+            file_info["type"] = all_items[item_id].get('type')
+        
+        all_files.append(file_info)
+    
+    result = {
         "files": all_files,
         "total": len(all_files)
-    })
+    }
+    if limit is not None or offset:
+        result["offset"] = offset
+        result["limit"] = limit
+        result["next_offset"] = offset + len(all_files) if has_more else None
+    return result
+
+def _record_error(errors, entry):
+    """Keep an error entry for the response, up to MAX_REPORTED_ERRORS"""
+    if len(errors) < MAX_REPORTED_ERRORS:
+        errors.append(entry)
+
+def _sync_batch(batch, errors):
+    """Send one batch of (relative_path, item_id, static_path) updates, returning how many succeeded"""
+    updates = [{"item_id": item_id, "item_path": static_path} for _, item_id, static_path in batch]
+    results = update_static_resources(updates)
+    
+    updated = 0
+    for (relative_path, item_id, _), result in zip(batch, results):
+        if result is None:
+            updated += 1
+            continue
+        status, error = result
+        _record_error(errors, {
+            "path": relative_path,
+            "item_id": item_id,
+            "status": status,
+            "error": error
+        })
+    return updated
 
 @app.route('/sync-static-resources', methods=['POST'])
 def sync_static_resources():
     """
     Synchronize all files with static resources, ensuring they all have the prepath
+    
+    Only counts and the first MAX_REPORTED_ERRORS problems are returned, so memory
+    stays bounded no matter how many files are synchronized.
     """
-    all_files = []
+    total = 0
     updated_count = 0
+    errors = []
+    batch = []
     all_items = get_all_items()
     static_resources = get_all_static_resources()
+    buckets, static_by_path, static_by_name = build_prediction_index(all_items, static_resources)
     
-    for root, dirs, files in os.walk(UPLOAD_FOLDER):
-        for file in files:
-            file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(file_path, UPLOAD_FOLDER)
-            
-            # Use enhanced prediction to determine the item_id
-            item_id = predict_item_id(relative_path, file, all_items, static_resources)
+    for dir_rel, dir_parts, file in _iter_files(UPLOAD_FOLDER):
+        relative_path = dir_rel + file
+        total += 1
+        
+        # Use enhanced prediction to determine the item_id
+        item_id = predict_item_id(relative_path, file, buckets, static_by_path, static_by_name, dir_parts + (file,))
+        
+        if item_id:
+            # Append prepath to the relative path
+            static_resource_path = f"{FILE_VIEW_PREPATH}{relative_path}"
+            batch.append((relative_path, item_id, static_resource_path))
             
-            if item_id:
-                # Append prepath to the relative path
-                static_resource_path = f"{FILE_VIEW_PREPATH}{relative_path}"
-                
-                try:
-                    # Update static resource with prepath
-                    static_resource = {
-                        "item_path": static_resource_path
-                    }
-                    response = requests.put(f"{API_STATIC_URL}/update/{item_id}", json=static_resource)
-                    
-                    if response.status_code == 200:
-                        updated_count += 1
-                        all_files.append({
-                            "path": relative_path,
-                            "item_id": item_id,
-                            "static_path": static_resource_path,
-                            "status": "updated"
-                        })
-                    else:
-                        all_files.append({
-                            "path": relative_path,
-                            "item_id": item_id,
-                            "status": "update_failed",
-                            "error": response.text
-                        })
-                except requests.RequestException as e:
-                    all_files.append({
-                        "path": relative_path,
-                        "item_id": item_id,
-                        "status": "error",
-                        "error": str(e)
-                    })
-            else:
-                all_files.append({
-                    "path": relative_path,
-                    "status": "no_item_id"
-                })
+            # Update static resources with prepath in bulk requests
+            if len(batch) >= SYNC_BATCH_SIZE:
+                updated_count += _sync_batch(batch, errors)
+                batch = []
+        else:
+            _record_error(errors, {
+                "path": relative_path,
+                "status": "no_item_id"
+            })
+    
+    if batch:
+        updated_count += _sync_batch(batch, errors)
+    
+    invalidate_cache()
     
     return jsonify({
         "success": True,
         "message": f"Synchronized {updated_count} static resources with prepath",
-        "files": all_files,
-        "total": len(all_files),
-        "updated": updated_count
+        "total": total,
+        "updated": updated_count,
+        "errors": errors
     })
 
+@app.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """Clear the cached items and static resources"""
+    invalidate_cache()
+    return jsonify({"success": True, "message": "Cache invalidated"})
+
 # Setup file serving routes
 setup_file_serving(app, UPLOAD_FOLDER)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=3000, debug=True)
+    # debug=None leaves app.debug as Flask parsed it from FLASK_DEBUG, so "0"/"false"/"no" stay off
+    app.run(host='0.0.0.0', port=3000, threaded=True, debug=None)
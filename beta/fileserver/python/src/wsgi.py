@@ -1,4 +1,8 @@
 # wsgi.py
+# Run with: gunicorn -k gevent -w 2 --worker-connections=1000 -b 0.0.0.0:3000 wsgi:application
+from gevent import monkey
+monkey.patch_all()
+
 from main import app as application
 
 if __name__ == "__main__":
@@ -1,14 +1,40 @@
 import sqlite3
+from flask import g
+from crud_database_static import DATABASE_STATIC_PATH
 
 # Path to the new database
 DATABASE_PATH = "database/database.db"
 
 
+def get_connection():
+    """
+    Return the items database connection for the current app context,
+    opening it on first use. close_connection() closes it on teardown.
+    """
+    conn = g.get('db')
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        g.db = conn
+    return conn
+
+
+def close_connection(exception=None):
+    """
+    Close the items database connection of the current app context, if any.
+    """
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.close()
+
+
 def add_item(category, name, details, type, item_id=None):
     """
     Add a new item to the 'items' table.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute(
@@ -22,20 +48,39 @@ def add_item(category, name, details, type, item_id=None):
         return True
     except sqlite3.IntegrityError:
         print("Error: Item ID already exists.")
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def get_all_items():
     """
     Retrieve all items from the 'items' table.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM items")
     items = cursor.fetchall()
-    conn.close()
+    return items
+
+
+def get_all_items_with_static():
+    """
+    Retrieve all items joined with their static resources in a single query.
+    Each row is the items columns followed by item_static's item_id and item_path,
+    which are None when the item has no static resource.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    # Attach the static resources database once per connection
+    cursor.execute("PRAGMA database_list")
+    if not any(row[1] == 'static' for row in cursor.fetchall()):
+        cursor.execute("ATTACH DATABASE ? AS static", (DATABASE_STATIC_PATH,))
+    cursor.execute("""
+        SELECT i.item_id, i.category, i.name, i.details, i.type, s.item_id, s.item_path
+        FROM items i
+        LEFT JOIN static.item_static s ON s.item_id = i.item_id
+    """)
+    items = cursor.fetchall()
     return items
 
 
@@ -43,11 +88,10 @@ def get_item_by_id(item_id):
     """
     Retrieve an item by its ID.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM items WHERE item_id = ?", (item_id,))
     item = cursor.fetchone()
-    conn.close()
     return item
 
 
@@ -55,39 +99,33 @@ def update_item(item_id, category=None, name=None, details=None, type=None):
     """
     Update an item's details by its ID.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        if category:
-            cursor.execute(
-                "UPDATE items SET category = ? WHERE item_id = ?", (category, item_id)
-            )
-        if name:
+        # Build one UPDATE covering only the fields that were provided
+        sets = []
+        params = []
+        for column, value in (("category", category), ("name", name), ("details", details), ("type", type)):
+            if value:
+                sets.append(f"{column} = ?")
+                params.append(value)
+        if sets:
             cursor.execute(
-                "UPDATE items SET name = ? WHERE item_id = ?", (name, item_id)
-            )
-        if details:
-            cursor.execute(
-                "UPDATE items SET details = ? WHERE item_id = ?", (details, item_id)
-            )
-        if type:
-            cursor.execute(
-                "UPDATE items SET type = ? WHERE item_id = ?", (type, item_id)
+                f"UPDATE items SET {', '.join(sets)} WHERE item_id = ?", (*params, item_id)
             )
         conn.commit()
         return True
     except Exception as e:
         print(f"Error updating item: {e}")
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def delete_item(item_id):
     """
     Delete an item by its ID.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
@@ -95,16 +133,15 @@ def delete_item(item_id):
         return True
     except Exception as e:
         print(f"Error deleting item: {e}")
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
 def create_table_if_not_exists():
     """
     Create the 'items' table if it doesn't exist yet.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS items (
@@ -116,4 +153,3 @@ def create_table_if_not_exists():
     )
     ''')
     conn.commit()
-    conn.close()
@@ -1,27 +1,97 @@
-from flask import request, jsonify
+import os
+import hashlib
+import orjson
+from flask import request, jsonify, current_app
 from crud_database import (
+    DATABASE_PATH,
     add_item,
-    get_all_items,
+    get_all_items_with_static,
     get_item_by_id,
     update_item,
     delete_item,
-    create_table_if_not_exists
+    create_table_if_not_exists,
+    close_connection as close_items_connection
 )
 from crud_database_static import (
+    DATABASE_STATIC_PATH,
     add_item_static,
     get_item_static,
     update_item_static,
+    update_items_static_bulk,
     delete_item_static,
     get_all_items_static,
-    create_static_table_if_not_exists
+    create_static_table_if_not_exists,
+    close_connection as close_static_connection
 )
 from auto_static import get_path_for_item
 
+# Serialized bodies of the read routes, each stored with the data version it was built from
+MAX_CACHED_RESPONSES = 1024
+_response_cache = {}
+# Bumped by every write request handled by this process
+_local_data_version = [0]
+
+
+def data_version():
+    """
+    Version stamp of the item data. It combines this process's write counter with
+    the size and mtime of both databases and their WAL files, so writes made by
+    other worker processes invalidate cached responses too.
+    """
+    stamp = [_local_data_version[0]]
+    for path in (DATABASE_PATH, DATABASE_STATIC_PATH):
+        for file_path in (path, path + "-wal"):
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                st = None
+            # An empty WAL is the same data as a missing one
+            stamp.append((st.st_mtime_ns, st.st_size) if st and st.st_size else None)
+    return tuple(stamp)
+
+
+def cached_json_response(key, build):
+    """
+    Return a JSON response for key, reusing the serialized body while the data is unchanged.
+    build() returns the object to serialize, or an (object, status) pair such as a 404.
+    A 200 response carries an ETag of the body, so clients revalidating with
+    If-None-Match get a 304 when nothing changed.
+    """
+    version = data_version()
+    cached = _response_cache.get(key)
+    if cached and cached[0] == version:
+        body, etag, status = cached[1], cached[2], cached[3]
+    else:
+        result = build()
+        obj, status = result if isinstance(result, tuple) else (result, 200)
+        body = orjson.dumps(obj)
+        etag = hashlib.md5(body).hexdigest()
+        if len(_response_cache) >= MAX_CACHED_RESPONSES:
+            _response_cache.clear()
+        _response_cache[key] = (version, body, etag, status)
+    
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+    if status != 200:
+        return response
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 def setup_routes(app):
+    # Database connections live for one app context (one request)
+    app.teardown_appcontext(close_items_connection)
+    app.teardown_appcontext(close_static_connection)
+    
     # Create database tables if they don't exist
-    create_table_if_not_exists()
-    create_static_table_if_not_exists()
+    with app.app_context():
+        create_table_if_not_exists()
+        create_static_table_if_not_exists()
+    
+    @app.after_request
+    def bump_data_version(response):
+        # Any write request may have changed the data behind cached responses
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            _local_data_version[0] += 1
+        return response
     
     @app.route('/')
     def home():
@@ -52,11 +122,34 @@ def setup_routes(app):
 
     @app.route('/items', methods=['GET'])
     def get_all_items_route():
-        items = get_all_items()
-        items_list = []
-        for item in items:
-            static_data = get_item_static(item[0])  # item[0] is item_id
-            item_dict = {
+        def build():
+            # Items and their static resources come back from one JOIN query
+            items = get_all_items_with_static()
+            items_list = []
+            for item in items:
+                item_dict = {
+                    "item_id": item[0],
+                    "category": item[1],
+                    "name": item[2],
+                    "details": item[3],
+                    "type": item[4],
+                    "static_resources": {
+                        "item_path": item[6]
+                    } if item[5] is not None else None
+                }
+                items_list.append(item_dict)
+            return items_list
+        return cached_json_response('items', build)
+
+    @app.route('/items/<int:item_id>', methods=['GET'])
+    def get_item_by_id_route(item_id):
+        # The item is only read from the database when the cached response is stale
+        def build():
+            item = get_item_by_id(item_id)
+            if not item:
+                return {"message": "Item not found"}, 404
+            static_data = get_item_static(item_id)
+            return {
                 "item_id": item[0],
                 "category": item[1],
                 "name": item[2],
@@ -66,27 +159,7 @@ def setup_routes(app):
                     "item_path": static_data[1] if static_data else None
                 } if static_data else None
             }
-            items_list.append(item_dict)
-        return jsonify(items_list), 200
-
-    @app.route('/items/<int:item_id>', methods=['GET'])
-    def get_item_by_id_route(item_id):
-        item = get_item_by_id(item_id)
-        if not item:
-            return jsonify({"message": "Item not found"}), 404
-
-        static_data = get_item_static(item_id)
-        item_dict = {
-            "item_id": item[0],
-            "category": item[1],
-            "name": item[2],
-            "details": item[3],
-            "type": item[4],
-            "static_resources": {
-                "item_path": static_data[1] if static_data else None
-            } if static_data else None
-        }
-        return jsonify(item_dict), 200
+        return cached_json_response(('item', item_id), build)
 
     @app.route('/items/update/<int:item_id>', methods=['PUT'])
     def update_item_route(item_id):
@@ -123,17 +196,16 @@ def setup_routes(app):
     # Static resources routes
     @app.route('/items/static', methods=['GET'])
     def get_all_items_static_route():
-        static_data = get_all_items_static()
-        if not static_data:
-            return jsonify([]), 200
-
-        result = []
-        for data in static_data:
-            result.append({
-                "item_id": data[0],
-                "item_path": data[1]
-            })
-        return jsonify(result), 200
+        def build():
+            static_data = get_all_items_static()
+            result = []
+            for data in static_data:
+                result.append({
+                    "item_id": data[0],
+                    "item_path": data[1]
+                })
+            return result
+        return cached_json_response('items_static', build)
 
     @app.route('/items/static/add/<int:item_id>', methods=['POST'])
     def add_item_static_route(item_id):
@@ -159,6 +231,28 @@ def setup_routes(app):
             return jsonify({"message": "Static resources updated successfully"}), 200
         return jsonify({"message": "Failed to update static resources"}), 400
 
+    @app.route('/items/static/bulk_update', methods=['POST'])
+    def bulk_update_items_static_route():
+        data = request.json
+        updates = data.get('updates') if isinstance(data, dict) else None
+        if not isinstance(updates, list):
+            return jsonify({"message": "Missing updates list"}), 400
+        # Every update needs an integer item_id, as the single-item routes get from the URL;
+        # a missing one would make SQLite allocate a new rowid for an orphan row
+        if not all(
+            isinstance(update, dict) and type(update.get('item_id')) is int
+            for update in updates
+        ):
+            return jsonify({"message": "Each update needs an integer item_id"}), 400
+
+        rows = [(update.get('item_id'), update.get('item_path')) for update in updates]
+        if update_items_static_bulk(rows):
+            return jsonify({
+                "message": "Static resources updated successfully",
+                "updated": len(rows)
+            }), 200
+        return jsonify({"message": "Failed to update static resources"}), 400
+
     @app.route('/items/static/delete/<int:item_id>', methods=['DELETE'])
     def delete_item_static_route(item_id):
         if delete_item_static(item_id):
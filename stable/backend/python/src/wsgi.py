@@ -1,5 +1,7 @@
 # wsgi.py
+# Run with: gunicorn -k gthread -w 4 --threads 8 -b 0.0.0.0:5000 wsgi:application
+# Each request gets its own WAL-mode SQLite connection, so threads can read concurrently
 from main import app as application
 
 if __name__ == "__main__":
-    application.run()
+    application.run(port=5000, threaded=True)
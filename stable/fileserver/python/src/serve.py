@@ -1,17 +1,177 @@
-from flask import send_from_directory, abort, Response
+from flask import send_from_directory, abort, Response, request
 import os
 import mimetypes
 import zipfile
-from io import BytesIO
 import pathlib
+from functools import lru_cache
+import unicodedata
+from urllib.parse import quote
+from werkzeug.datastructures import Headers
+
+@lru_cache(maxsize=1024)
+def mimetype_for_extension(ext):
+    """MIME type for a lowercased file extension such as ".pdf", cached per extension"""
+    mime_type, _ = mimetypes.guess_type('file' + ext)
+    return mime_type or 'application/octet-stream'
 
 def get_mimetype(file_path):
     """Get MIME type for a file"""
-    mime_type, _ = mimetypes.guess_type(file_path)
-    return mime_type or 'application/octet-stream'
+    ext = os.path.splitext(file_path)[1]
+    lower_ext = ext.lower()
+    if lower_ext in mimetypes.suffix_map or lower_ext in mimetypes.encodings_map:
+        # Compound names like ".tar.gz" depend on more than the last extension, and
+        # guess_type treats upper-case ones such as ".GZ" differently, so keep its answer
+        mime_type, _ = mimetypes.guess_type(file_path)
+        return mime_type or 'application/octet-stream'
+    return mimetype_for_extension(lower_ext)
+
+def iter_folder_files(root, rel_dir=''):
+    """
+    Recursively yield (path, relative_path) for every file under root using os.scandir,
+    so entry types come from the directory listing instead of a stat per entry
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_folder_files(entry.path, rel_dir + entry.name + os.sep)
+            elif entry.is_file():
+                yield entry.path, rel_dir + entry.name
+
+# Seconds clients may reuse a served file before revalidating it (uploads get unique names)
+FILE_MAX_AGE = 3600
+
+# Hand file bodies to the front web server instead of sending them from Python:
+# USE_X_SENDFILE=1 for Apache/lighttpd style X-Sendfile, or X_ACCEL_REDIRECT_PREFIX set to
+# the nginx "internal" location that maps onto the files directory (e.g. "/protected/")
+USE_X_SENDFILE = bool(os.environ.get('USE_X_SENDFILE'))
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+
+def set_attachment_filename(headers, filename):
+    """
+    Set an attachment Content-Disposition the way send_file does: options are quoted,
+    and non-ASCII names get an ASCII filename plus an RFC 5987 filename* parameter,
+    since servers such as gunicorn encode header values as latin-1
+    """
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        # safe = RFC 5987 attr-char
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    else:
+        names = {'filename': filename}
+    headers.set('Content-Disposition', 'attachment', **names)
+
+def send_stored_file(base_dir, safe_path, as_attachment):
+    """Send base_dir/safe_path, letting nginx do the transfer when configured"""
+    full_path = os.path.join(base_dir, safe_path)
+    filename = os.path.basename(full_path)
+    mime_type = get_mimetype(full_path)
+    
+    if X_ACCEL_REDIRECT_PREFIX:
+        headers = Headers({'X-Accel-Redirect': X_ACCEL_REDIRECT_PREFIX + quote(safe_path.replace(os.sep, '/'))})
+        if as_attachment:
+            set_attachment_filename(headers, filename)
+        return Response(mimetype=mime_type, headers=headers)
+    
+    # Conditional and Range requests are answered from the file's mtime/size ETag
+    return send_from_directory(
+        os.path.dirname(full_path),
+        filename,
+        as_attachment=as_attachment,
+        mimetype=mime_type,
+        conditional=True,
+        max_age=FILE_MAX_AGE
+    )
+
+# Bytes read from each file per chunk while streaming a folder archive
+ZIP_STREAM_CHUNK_SIZE = 1 << 20
+
+# Formats that are already compressed; deflating them costs CPU and saves next to nothing
+ZIP_STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp4', '.mkv', '.mov', '.webm', '.avi', '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar',
+    '.pdf', '.epub', '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp'
+})
+
+# Deflate level for the other files; archives are built per request, so favour speed
+ZIP_DEFLATE_LEVEL = 1
+
+def zip_compress_type(file_path):
+    """Compression method for a file added to a folder archive"""
+    if os.path.splitext(file_path)[1].lower() in ZIP_STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+class ZipStream:
+    """Write-only file object that holds what ZipFile writes until it is drained"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        """Return and forget everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_folder_zip(folder):
+    """
+    Yield a zip archive of every file under folder as it is being built, so memory
+    stays at about one chunk no matter how large the folder is
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file_path, arcname in iter_folder_files(folder):
+            zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+            zinfo.compress_type = zip_compress_type(arcname)
+            # ZipFile.open() takes the level from the ZipInfo (compress_level from Python 3.13)
+            zinfo._compresslevel = ZIP_DEFLATE_LEVEL
+            with open(file_path, 'rb') as source, zipf.open(zinfo, 'w') as target:
+                while True:
+                    chunk = source.read(ZIP_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    data = stream.drain()
+                    if data:
+                        yield data
+            # The entry's data descriptor is written when it is closed
+            yield stream.drain()
+    # Central directory
+    yield stream.drain()
+
+def parse_pagination(args):
+    """
+    Read the optional ?limit=&offset= window from the query arguments.
+    Returns (limit, offset); limit is None when no limit was requested.
+    Raises ValueError for values that are not integers or out of range.
+    
+    Paginated listings keep "total" as the number of entries in the response, as
+    unpaginated ones always had it, and add offset, limit and next_offset.
+    """
+    limit = args.get('limit')
+    try:
+        limit = int(limit) if limit not in (None, '') else None
+        offset = int(args.get('offset') or 0)
+    except ValueError:
+        raise ValueError("limit and offset must be integers") from None
+    if offset < 0 or (limit is not None and limit < 1):
+        raise ValueError("limit must be positive and offset must not be negative")
+    return limit, offset
 
 def setup_file_serving(app, base_dir='db'):
     """Setup routes for serving files from the database directory"""
+    app.use_x_sendfile = USE_X_SENDFILE
     
     @app.route('/files/download/<path:file_path>', methods=['GET'])
     def download_file(file_path):
@@ -28,18 +188,7 @@ def setup_file_serving(app, base_dir='db'):
             if not os.path.isfile(full_path):
                 abort(404)  # Not found
                 
-            directory = os.path.dirname(full_path)
-            filename = os.path.basename(full_path)
-            
-            # Get the mime type for the file
-            mime_type = get_mimetype(full_path)
-            
-            return send_from_directory(
-                directory, 
-                filename, 
-                as_attachment=True,
-                mimetype=mime_type
-            )
+            return send_stored_file(base_dir, safe_path, as_attachment=True)
         except Exception as e:
             return {"error": str(e)}, 500
     
@@ -59,20 +208,7 @@ def setup_file_serving(app, base_dir='db'):
             if not os.path.isfile(full_path):
                 abort(404, f"File not found: {full_path}")  # Not found with details
                 
-            # Get the directory and filename separately
-            directory = os.path.dirname(full_path)
-            filename = os.path.basename(full_path)
-            
-            # Get the mime type for the file
-            mime_type = get_mimetype(full_path)
-            
-            # Use send_from_directory with absolute path
-            return send_from_directory(
-                directory, 
-                filename, 
-                as_attachment=False,
-                mimetype=mime_type
-            )
+            return send_stored_file(base_dir, safe_path, as_attachment=False)
         except Exception as e:
             return {"error": str(e)}, 500
     
@@ -91,31 +227,17 @@ def setup_file_serving(app, base_dir='db'):
             if not os.path.isdir(full_path):
                 abort(404)  # Not found
                 
-            # Create a BytesIO object to store the zip file
-            memory_file = BytesIO()
-            
-            with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Walk through the directory
-                for root, dirs, files in os.walk(full_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        # Calculate the relative path from the requested folder
-                        arcname = os.path.relpath(file_path, full_path)
-                        zipf.write(file_path, arcname)
-            
-            # Reset the file pointer to the beginning
-            memory_file.seek(0)
-            
             # Determine the zip file name (use the folder name)
             folder_name = os.path.basename(full_path)
             zip_filename = f"{folder_name}.zip"
             
+            # Stream the archive while it is built instead of buffering it in memory
+            headers = Headers()
+            set_attachment_filename(headers, zip_filename)
             return Response(
-                memory_file.getvalue(),
+                stream_folder_zip(full_path),
                 mimetype='application/zip',
-                headers={
-                    'Content-Disposition': f'attachment; filename={zip_filename}'
-                }
+                headers=headers
             )
         except Exception as e:
             return {"error": str(e)}, 500
@@ -132,55 +254,72 @@ def setup_file_serving(app, base_dir='db'):
                 
             full_path = os.path.join(base_dir, safe_path)
             
-            # Check if the path exists
-            if not os.path.exists(full_path):
+            # List all files and directories; DirEntry caches the type bits from the directory listing.
+            # Opening the path tells whether it exists and is a directory, without a stat beforehand
+            try:
+                with os.scandir(full_path) as it:
+                    entries = [(1 if entry.is_dir() else 2, entry.name, entry) for entry in it]
+            except FileNotFoundError:
                 abort(404, f"Path not found: {full_path}")  # Not found with details
-                
-            if os.path.isfile(full_path):
+            except NotADirectoryError:
                 # If it's a file, redirect to view_file
                 return view_file(folder_path)
-                
-            # If it's a directory, list the contents
-            items = []
             
-            # Add parent directory link (if not at root)
-            if folder_path:
-                parent_path = os.path.dirname(folder_path)
-                items.append({
-                    "name": "..",  # Parent directory
-                    "path": parent_path,
-                    "type": "directory",
-                    "size": 0,
-                    "is_parent": True
-                })
+            try:
+                limit, offset = parse_pagination(request.args)
+            except ValueError as e:
+                return {"error": str(e)}, 400
             
-            # List all files and directories
-            for item in os.listdir(full_path):
-                item_path = os.path.join(full_path, item)
+            # Sort by type (directories first) and then by name, with the parent directory
+            # link (if not at root) in front; None stands for the parent link
+            entries.sort(key=lambda x: (x[0], x[1]))
+            rows = ([None] if folder_path else []) + entries
+            total = len(rows)
+            end = total if limit is None else min(total, offset + limit)
+            
+            # Only the requested window is stat'ed and described
+            items = []
+            for row in rows[offset:end]:
+                if row is None:
+                    items.append({
+                        "name": "..",  # Parent directory
+                        "path": os.path.dirname(folder_path),
+                        "type": "directory",
+                        "size": 0,
+                        "is_parent": True
+                    })
+                    continue
+                
+                kind, item, entry = row
                 rel_path = os.path.join(folder_path, item) if folder_path else item
+                is_file = kind == 2 and entry.is_file()
                 
                 item_info = {
                     "name": item,
                     "path": rel_path,
-                    "type": "directory" if os.path.isdir(item_path) else "file",
-                    "size": os.path.getsize(item_path) if os.path.isfile(item_path) else 0,
+                    "type": "directory" if kind == 1 else "file",
+                    "size": entry.stat().st_size if is_file else 0,
                     "is_parent": False
                 }
                 
                 # Add file extension for files
-                if os.path.isfile(item_path):
+                if is_file:
                     item_info["extension"] = os.path.splitext(item)[1][1:].lower()
-                    item_info["mimetype"] = get_mimetype(item_path)
+                    item_info["mimetype"] = get_mimetype(item)
                 
                 items.append(item_info)
             
-            # Sort items by type (directories first) and then by name
-            items.sort(key=lambda x: (0 if x.get("is_parent") else (1 if x["type"] == "directory" else 2), x["name"]))
-            
-            return {
+            result = {
                 "current_path": folder_path,
                 "items": items,
                 "total": len(items)
             }
+            if limit is not None or offset:
+                result["offset"] = offset
+                result["limit"] = limit
+                result["next_offset"] = end if end < total else None
+                # Entries in the whole directory, parent link included
+                result["directory_total"] = total
+            return result
         except Exception as e:
             return {"error": str(e)}, 500